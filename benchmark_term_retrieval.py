@@ -0,0 +1,126 @@
+import sys
+import time
+import numpy as np
+import investment_terms_nlp
+from investment_terms_nlp import initialize_term_data, preprocess_text, search_terms, TERMS_CSV, SIMILARITY_THRESHOLD
+
+# Фіксований набір запитів: відмінки, множина, перефразування та опис терміна своїми словами
+BENCHMARK_QUERIES = [
+    ("що таке облігація", "Облігації"),
+    ("дивіденди", "Дивіденд"),
+    ("розкажи про диверсифікацію", "Диверсифікація"),
+    ("волатильності", "Волатильність"),
+    ("що означає ліквідність активу", "Ліквідність"),
+    ("хедж фонди", "Хедж-фонд"),
+    ("складні відсотки", "Складний відсоток"),
+    ("ETF", "Біржовий фонд (ETF)"),
+    ("короткі продажі", "Короткий продаж"),
+    ("маржинальний рахунок", "Маржинальний рахунок"),
+    ("що таке ф'ючерси", "Ф'ючерс"),
+    ("піраміда понці", "Схеми Понці / Піраміди"),
+    ("толерантність до ризиків", "Толерантність до ризику"),
+    ("опціони", "Опціон"),
+    ("прибуток на акцію", "Прибуток на акцію (EPS)"),
+    ("стандартного відхилення", "Стандартне відхилення"),
+    ("тікер", "Тікерний символ"),
+    ("взаємні фонди", "Взаємний фонд"),
+    ("дериватив це", "Дериватив"),
+    ("розподіл активів у портфелі", "Розподіл активів"),
+    ("контракт на купівлю активу в майбутньому за ціною сьогодні", "Ф'ючерс"),
+    ("позичити акції і продати їх", "Короткий продаж"),
+    ("частка прибутку компанії що виплачується акціонерам", "Дивіденд"),
+    ("скільки ризику я готовий прийняти", "Толерантність до ризику"),
+]
+
+# Запити, що не стосуються жодного терміна; бот має відповісти, що не знайшов інформації
+OFF_TOPIC_QUERIES = [
+    "привіт", "привіт як справи", "як справи", "добрий день", "дякую", "до побачення",
+    "що ти вмієш", "хто ти", "як тебе звати", "скільки тобі років", "що нового", "допоможи",
+    "hello", "ок", "яка погода в києві", "погода завтра", "котра година",
+    "купи мені піцу", "розкажи анекдот", "порадь фільм",
+]
+
+THRESHOLD_GRID = [round(0.2 + 0.01 * step, 2) for step in range(21)]
+
+def measure_queries(queries, top_k):
+    latencies = []
+    results = []
+    for query, _ in queries:
+        started = time.perf_counter()
+        results.append(search_terms(preprocess_text(query), top_k))
+        latencies.append(time.perf_counter() - started)
+    return results, np.array(latencies) * 1000
+
+def evaluate_thresholds(on_topic, off_topic_scores, thresholds=THRESHOLD_GRID):
+    """
+    Для кожного порогу рахує частку правильних відповідей на запити про терміни
+    та частку хибних відповідей на сторонні запити.
+
+    :param on_topic: Список пар (схожість, чи знайдено очікуваний термін)
+    :param off_topic_scores: Схожість найближчого терміна для сторонніх запитів
+    :return: Список кортежів (поріг, recall@1, частка хибних спрацювань)
+    """
+    results = []
+    for threshold in thresholds:
+        recall = sum(found and score >= threshold for score, found in on_topic) / len(on_topic)
+        false_positive_rate = sum(score >= threshold for score in off_topic_scores) / len(off_topic_scores)
+        results.append((threshold, recall, false_positive_rate))
+    return results
+
+def choose_threshold(threshold_results):
+    """Найменший поріг без хибних спрацювань на сторонніх запитах"""
+    for threshold, _, false_positive_rate in threshold_results:
+        if false_positive_rate == 0:
+            return threshold
+    return threshold_results[-1][0]
+
+def run_benchmark(csv_file=TERMS_CSV, top_k=3):
+    """
+    Вимірює точність пошуку (recall@1, recall@k) та затримку на фіксованому наборі запитів.
+
+    :param csv_file: CSV з термінами
+    :param top_k: Глибина пошуку для recall@k
+    :return: Словник з метриками
+    """
+    started = time.perf_counter()
+    initialize_term_data(csv_file)
+    startup_time = time.perf_counter() - started
+
+    terms = [term['term'] for term in investment_terms_nlp.knowledge_base.terms]
+    results, cold_latencies = measure_queries(BENCHMARK_QUERIES, top_k)
+    _, cached_latencies = measure_queries(BENCHMARK_QUERIES, top_k)
+
+    hits_at_1 = 0
+    hits_at_k = 0
+    for (query, expected), result in zip(BENCHMARK_QUERIES, results):
+        found = [terms[idx] for idx, _ in result]
+        hits_at_1 += found[0] == expected
+        hits_at_k += expected in found
+        if found[0] != expected:
+            print(f"Промах: '{query}' -> '{found[0]}' (очікувалось '{expected}')")
+
+    on_topic = [(result[0][1], terms[result[0][0]] == expected) for (_, expected), result in zip(BENCHMARK_QUERIES, results)]
+    off_topic_scores = [search_terms(preprocess_text(query))[0][1] for query in OFF_TOPIC_QUERIES]
+    threshold_results = evaluate_thresholds(on_topic, off_topic_scores)
+    print("поріг  recall@1  хибні спрацювання")
+    for threshold, recall, false_positive_rate in threshold_results:
+        print(f"{threshold:.2f}   {recall:.4f}    {false_positive_rate:.4f}")
+
+    current = evaluate_thresholds(on_topic, off_topic_scores, [SIMILARITY_THRESHOLD])[0]
+    return {
+        "startup_time": startup_time,
+        "similarity_threshold": SIMILARITY_THRESHOLD,
+        "recall_at_1_above_threshold": current[1],
+        "off_topic_false_positive_rate": current[2],
+        "recommended_threshold": choose_threshold(threshold_results),
+        "recall_at_1": hits_at_1 / len(BENCHMARK_QUERIES),
+        f"recall_at_{top_k}": hits_at_k / len(BENCHMARK_QUERIES),
+        "latency_p50_ms": np.percentile(cold_latencies, 50),
+        "latency_p95_ms": np.percentile(cold_latencies, 95),
+        "cached_latency_p50_ms": np.percentile(cached_latencies, 50),
+    }
+
+if __name__ == '__main__':
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else TERMS_CSV
+    for name, value in run_benchmark(csv_file).items():
+        print(f"{name}: {value:.4f}")
@@ -0,0 +1,198 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from investment_recommendation_system import get_signal, BUY_THRESHOLD, SELL_THRESHOLD
+
+TRADING_DAYS = 252
+
+def momentum_forecast(close, window=20):
+    """
+    Прогноз ціни наступного дня за середньою дохідністю останніх днів.
+    Використовує лише дані до поточного дня включно, тому придатний для walk-forward перевірки.
+    """
+    return close * (1 + close.pct_change().rolling(window=window).mean())
+
+def lstm_walk_forward_forecast(close, train_window=504, refit_every=63, look_back=60, time_budget=60):
+    """
+    Прогноз ціни наступного дня моделлю LSTM з stock_price_prediction_model у режимі walk-forward.
+
+    Модель перенавчається кожні refit_every днів на останніх train_window днях перед початком блоку
+    і прогнозує всі дні блоку одним пакетним викликом, тому цикл іде по блоках, а не по днях.
+    Історії настроїв новин немає, тому ознака sentiment дорівнює нулю.
+
+    :param close: Series з цінами закриття
+    :param train_window: Кількість днів для навчання кожної моделі
+    :param refit_every: Кількість днів між перенавчаннями
+    :param look_back: Довжина вхідної послідовності моделі
+    :param time_budget: Бюджет часу на навчання однієї моделі, с
+    :return: Series прогнозів, вирівняний з close (NaN для перших train_window днів)
+    """
+    # TensorFlow імпортується лише тоді, коли потрібна модель, щоб імпульсний прогноз не залежав від нього
+    from stock_price_prediction_model import prepare_data, train_model
+    from model_lifecycle import clear_keras_session
+
+    data = pd.DataFrame({'close': close.to_numpy(dtype=float), 'sentiment': 0.0})
+    predicted = np.full(len(data), np.nan)
+    for start in range(train_window, len(data), refit_every):
+        end = min(start + refit_every, len(data))
+        X, y, scaler = prepare_data(data.iloc[start - train_window:start], look_back)
+        model, _ = train_model(X, y, time_budget)
+
+        scaled = scaler.transform(data[['close', 'sentiment']].iloc[start - look_back + 1:end])
+        windows = np.lib.stride_tricks.sliding_window_view(scaled, look_back, axis=0).transpose(0, 2, 1)
+        predicted_scaled = model.predict(windows, verbose=0)[:, 0]
+        predicted[start:end] = scaler.inverse_transform(np.column_stack([predicted_scaled, np.zeros(len(predicted_scaled))]))[:, 0]
+
+        del model
+        clear_keras_session()
+
+    return pd.Series(predicted, index=close.index)
+
+PREDICTORS = {
+    "momentum": momentum_forecast,
+    "lstm": lstm_walk_forward_forecast,
+}
+
+def backtest_signals(close, predicted, sentiment=None, buy_threshold=BUY_THRESHOLD,
+                     sell_threshold=SELL_THRESHOLD, transaction_cost=0.001, long_only=False):
+    """
+    Векторизована перевірка правил рекомендацій на історичних даних.
+
+    Сигнал дня t розраховується з ціни закриття та прогнозу на день t і
+    виконується на дохідності з t до t+1. Сигнал "утримувати" зберігає попередню позицію.
+
+    :param close: Series з цінами закриття
+    :param predicted: Series з прогнозом ціни наступного дня, вирівняний з close
+    :param sentiment: Series або число з настроєм новин; None - настрій збігається з напрямком прогнозу
+    :param buy_threshold: Поріг очікуваної зміни для купівлі
+    :param sell_threshold: Поріг очікуваної зміни для продажу
+    :param transaction_cost: Витрати на угоду як частка обороту
+    :param long_only: Якщо True, сигнал продажу закриває позицію замість відкриття короткої
+    :return: Словник з метриками
+    """
+    expected_change = (predicted - close) / close
+    if sentiment is None:
+        # Історії настроїв новин немає, тому за замовчуванням перевіряється лише умова на прогноз
+        sentiment = np.sign(expected_change)
+
+    signals = pd.Series(get_signal(expected_change, sentiment, buy_threshold, sell_threshold), index=close.index)
+
+    positions = signals.replace(0, np.nan).ffill().fillna(0)
+    if long_only:
+        positions = positions.clip(lower=0)
+
+    next_returns = close.pct_change().shift(-1)
+    valid = next_returns.notna()
+    signals, positions, next_returns = signals[valid], positions[valid], next_returns[valid]
+    if next_returns.empty:
+        raise ValueError("Недостатньо історичних даних для перевірки")
+
+    turnover = positions.diff().fillna(positions).abs()
+    strategy_returns = positions * next_returns - transaction_cost * turnover
+
+    equity = (1 + strategy_returns).cumprod()
+    drawdown = equity / equity.cummax() - 1
+    years = len(strategy_returns) / TRADING_DAYS
+    # Коротка позиція може втратити більше за капітал; тоді річна дохідність - повна втрата
+    annual_return = equity.iloc[-1] ** (1 / years) - 1 if equity.iloc[-1] > 0 else -1.0
+
+    active = signals != 0
+    hits = np.sign(next_returns[active]) == signals[active]
+
+    return {
+        "days": len(strategy_returns),
+        "signals": int(active.sum()),
+        "buy_signals": int((signals == 1).sum()),
+        "sell_signals": int((signals == -1).sum()),
+        "hit_rate": hits.mean() if active.any() else np.nan,
+        "total_return": equity.iloc[-1] - 1,
+        "annual_return": annual_return,
+        "annual_volatility": strategy_returns.std() * np.sqrt(TRADING_DAYS),
+        "sharpe_ratio": strategy_returns.mean() / strategy_returns.std() * np.sqrt(TRADING_DAYS) if strategy_returns.std() > 0 else np.nan,
+        "max_drawdown": drawdown.min(),
+        "turnover": turnover.sum() / years,
+        "exposure": (positions != 0).mean(),
+        "buy_and_hold_return": (1 + next_returns).prod() - 1,
+    }
+
+def get_close_prices(symbol, start_date, end_date):
+    data = yf.download(symbol, start=start_date, end=end_date, progress=False)
+    if data.empty:
+        raise ValueError(f"Немає історичних даних для {symbol}")
+    close = data['Close']
+    if isinstance(close, pd.DataFrame):
+        close = close[symbol]
+    return close
+
+def backtest_symbol(symbol, start_date, end_date, predictor=momentum_forecast, **kwargs):
+    """
+    Перевіряє правила рекомендацій для одного символу.
+
+    :param predictor: Функція, що за Series цін закриття повертає Series прогнозів наступної ціни
+                      без заглядання в майбутнє; має бути визначена на рівні модуля для роботи в пулі процесів
+    :return: Словник з метриками або None у разі помилки
+    """
+    try:
+        close = get_close_prices(symbol, start_date, end_date)
+        metrics = backtest_signals(close, predictor(close), **kwargs)
+        metrics["symbol"] = symbol
+        return metrics
+    except Exception as e:
+        print(f"Помилка при тестуванні стратегії для {symbol}: {e}")
+        return None
+
+def run_backtest(symbols, start_date, end_date, processes=None, predictor=momentum_forecast, **kwargs):
+    """
+    Паралельно перевіряє правила рекомендацій для списку символів у пулі процесів.
+
+    :param symbols: Список символів акцій або криптовалют
+    :param start_date: Початкова дата історії
+    :param end_date: Кінцева дата історії
+    :param processes: Кількість процесів (за замовчуванням - кількість ядер)
+    :return: DataFrame з метриками, індексований символами
+    """
+    worker = partial(backtest_symbol, start_date=start_date, end_date=end_date, predictor=predictor, **kwargs)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = [metrics for metrics in executor.map(worker, symbols) if metrics is not None]
+
+    if not results:
+        return pd.DataFrame()
+
+    report = pd.DataFrame(results).set_index("symbol")
+    silent = report.index[report["signals"] == 0].tolist()
+    if silent:
+        print(f"Попередження: правило не дало жодного сигналу для {', '.join(silent)}. "
+              "Прогноз рідко виходить за пороги, тому метрики не описують правило; "
+              "спробуйте інший прогноз (--predictor) або пороги.")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Історична перевірка правил інвестиційних рекомендацій")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--start", default="2015-01-01")
+    parser.add_argument("--end", default=pd.Timestamp.today().strftime('%Y-%m-%d'))
+    parser.add_argument("--buy-threshold", type=float, default=BUY_THRESHOLD)
+    parser.add_argument("--sell-threshold", type=float, default=SELL_THRESHOLD)
+    parser.add_argument("--transaction-cost", type=float, default=0.001)
+    parser.add_argument("--long-only", action="store_true")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--predictor", choices=sorted(PREDICTORS), default="momentum")
+    args = parser.parse_args()
+
+    report = run_backtest(
+        [symbol.upper() for symbol in args.symbols], args.start, args.end,
+        processes=args.processes,
+        predictor=PREDICTORS[args.predictor],
+        buy_threshold=args.buy_threshold,
+        sell_threshold=args.sell_threshold,
+        transaction_cost=args.transaction_cost,
+        long_only=args.long_only
+    )
+    print(report.to_string(float_format=lambda value: f"{value:.4f}"))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+import json
+import math
+import sqlite3
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+import pandas as pd
+
+VOLATILITY_WINDOW = 30
+VOLATILITY_HISTORY = 252
+RISK_WINDOW = 21
+TRADING_DAYS = 252
+
+
+class RollingMoments:
+    """Середнє та дисперсія в ковзному вікні з оновленням за O(1)"""
+
+    def __init__(self, window, values=()):
+        self.window = window
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        for value in values:
+            self.add(value)
+
+    def add(self, value):
+        if len(self.values) == self.window:
+            self.remove_oldest()
+        self.values.append(value)
+        delta = value - self.mean
+        self.mean += delta / len(self.values)
+        self.m2 += delta * (value - self.mean)
+
+    def remove_oldest(self):
+        value = self.values.popleft()
+        count = len(self.values)
+        if count == 0:
+            self.mean, self.m2 = 0.0, 0.0
+            return
+        new_mean = self.mean - (value - self.mean) / count
+        self.m2 -= (value - new_mean) * (value - self.mean)
+        self.mean = new_mean
+
+    def is_full(self):
+        return len(self.values) == self.window
+
+    def std(self):
+        count = len(self.values)
+        return math.sqrt(max(self.m2, 0.0) / (count - 1)) if count > 1 else math.nan
+
+
+class RollingCovariance:
+    """Коваріація двох рядів дохідностей у ковзному вікні з оновленням за O(1)"""
+
+    def __init__(self, window, pairs=()):
+        self.window = window
+        self.pairs = deque()
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.c_xy = 0.0
+        self.m2_y = 0.0
+        for x, y in pairs:
+            self.add(x, y)
+
+    def add(self, x, y):
+        if len(self.pairs) == self.window:
+            self.remove_oldest()
+        self.pairs.append((x, y))
+        count = len(self.pairs)
+        delta_x = x - self.mean_x
+        delta_y = y - self.mean_y
+        self.mean_x += delta_x / count
+        self.mean_y += delta_y / count
+        self.c_xy += delta_x * (y - self.mean_y)
+        self.m2_y += delta_y * (y - self.mean_y)
+
+    def remove_oldest(self):
+        x, y = self.pairs.popleft()
+        count = len(self.pairs)
+        if count == 0:
+            self.mean_x, self.mean_y, self.c_xy, self.m2_y = 0.0, 0.0, 0.0, 0.0
+            return
+        new_mean_x = self.mean_x - (x - self.mean_x) / count
+        new_mean_y = self.mean_y - (y - self.mean_y) / count
+        self.c_xy -= (x - new_mean_x) * (y - self.mean_y)
+        self.m2_y -= (y - new_mean_y) * (y - self.mean_y)
+        self.mean_x, self.mean_y = new_mean_x, new_mean_y
+
+    def beta(self):
+        if len(self.pairs) < 2 or self.m2_y <= 0:
+            return math.nan
+        return self.c_xy / self.m2_y
+
+
+class RollingOrderStatistics:
+    """Відсортоване ковзне вікно для перцентилів та рангів: пошук за O(log n), вставка та видалення за O(n)"""
+
+    def __init__(self, window, values=()):
+        self.window = window
+        self.values = deque()
+        self.sorted_values = []
+        for value in values:
+            self.add(value)
+
+    def add(self, value):
+        if len(self.values) == self.window:
+            oldest = self.values.popleft()
+            del self.sorted_values[bisect_left(self.sorted_values, oldest)]
+        self.values.append(value)
+        insort(self.sorted_values, value)
+
+    def percentile_of(self, value):
+        """Ранг значення у відсотках, як scipy.stats.percentileofscore(kind='rank')"""
+        count = len(self.sorted_values)
+        if count == 0 or math.isnan(value):
+            return math.nan
+        left = bisect_left(self.sorted_values, value)
+        right = bisect_right(self.sorted_values, value)
+        return (left + right + (1 if right > left else 0)) * 50.0 / count
+
+    def quantile(self, q):
+        """Квантиль з лінійною інтерполяцією, як numpy.percentile"""
+        count = len(self.sorted_values)
+        if count == 0:
+            return math.nan
+        position = q * (count - 1)
+        lower = math.floor(position)
+        upper = min(lower + 1, count - 1)
+        fraction = position - lower
+        return self.sorted_values[lower] + (self.sorted_values[upper] - self.sorted_values[lower]) * fraction
+
+
+def to_date_keys(closes):
+    """Series цін закриття з індексом у вигляді рядків дат YYYY-MM-DD"""
+    if isinstance(closes, pd.DataFrame):
+        closes = closes.iloc[:, 0]
+    closes = closes.dropna()
+    return pd.Series(closes.values, index=[pd.Timestamp(date).strftime('%Y-%m-%d') for date in closes.index])
+
+def completed_bars(closes, last_date, today=None):
+    """Бари після last_date, крім поточного дня, ціна закриття якого ще змінюється"""
+    today = today or pd.Timestamp.today().strftime('%Y-%m-%d')
+    mask = closes.index < today
+    if last_date is not None:
+        mask &= closes.index > last_date
+    return closes[mask]
+
+def history_breaks(closes, last_date, last_close):
+    """
+    Чи не можна продовжити стан новими барами, і його потрібно будувати заново:
+    нова ціна закриття бару last_date відрізняється від збереженої (yfinance перераховує
+    скориговану історію після сплітів і дивідендів), або нові дані починаються після last_date
+    і перша дохідність рахувалася б від ціни поза отриманими даними.
+    """
+    if last_date is None or closes.empty:
+        return False
+    if last_date not in closes.index:
+        return last_date < closes.index[0]
+    return not math.isclose(float(closes[last_date]), last_close, rel_tol=1e-6)
+
+
+class BenchmarkState:
+    """Стан беті активу відносно ринкового індексу"""
+
+    def __init__(self, window=RISK_WINDOW):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.last_date = None
+        self.last_asset_close = None
+        self.last_market_close = None
+        self.covariance = RollingCovariance(self.window)
+
+    def needs_rebuild(self, asset_closes, market_closes):
+        """Чи змінилась історія активу або індексу після останнього оновлення чи в ній є розрив"""
+        return (history_breaks(to_date_keys(asset_closes), self.last_date, self.last_asset_close)
+                or history_breaks(to_date_keys(market_closes), self.last_date, self.last_market_close))
+
+    def update(self, asset_closes, market_closes, today=None):
+        """Додає нові спільні бари активу та індексу; якщо історію скориговано або є розрив, будує стан заново"""
+        if self.needs_rebuild(asset_closes, market_closes):
+            self.reset()
+        aligned = pd.concat([to_date_keys(asset_closes), to_date_keys(market_closes)], axis=1, join='inner')
+        for date, (asset_close, market_close) in completed_bars(aligned, self.last_date, today).iterrows():
+            if self.last_asset_close is not None:
+                self.covariance.add(asset_close / self.last_asset_close - 1, market_close / self.last_market_close - 1)
+            self.last_date = date
+            self.last_asset_close = asset_close
+            self.last_market_close = market_close
+
+    def to_dict(self):
+        return {
+            "last_date": self.last_date,
+            "last_asset_close": self.last_asset_close,
+            "last_market_close": self.last_market_close,
+            "pairs": list(self.covariance.pairs),
+        }
+
+    @classmethod
+    def from_dict(cls, data, window=RISK_WINDOW):
+        state = cls(window)
+        state.last_date = data["last_date"]
+        state.last_asset_close = data["last_asset_close"]
+        state.last_market_close = data["last_market_close"]
+        state.covariance = RollingCovariance(window, data["pairs"])
+        return state
+
+
+class IndicatorState:
+    """
+    Інкрементний стан індикаторів символу.
+    Кожен новий бар оновлює волатильність і бету за O(1), а перцентилі - за O(n) від довжини вікна,
+    тому не потрібно перераховувати всю історію при кожному запиті.
+    """
+
+    def __init__(self):
+        self.benchmarks = {}
+        self.reset()
+
+    def reset(self):
+        self.last_date = None
+        self.last_close = None
+        self.volatility = RollingMoments(VOLATILITY_WINDOW)
+        self.volatility_history = RollingOrderStatistics(VOLATILITY_HISTORY)
+        self.risk_returns = RollingMoments(RISK_WINDOW)
+        self.risk_quantiles = RollingOrderStatistics(RISK_WINDOW)
+
+    def add_bar(self, date, close):
+        if self.last_close is not None:
+            daily_return = close / self.last_close - 1
+            self.volatility.add(daily_return)
+            if self.volatility.is_full():
+                self.volatility_history.add(self.volatility.std())
+            self.risk_returns.add(daily_return)
+            self.risk_quantiles.add(daily_return)
+        self.last_date = date
+        self.last_close = close
+
+    def needs_rebuild(self, closes):
+        """Чи змінилась ціна закриття останнього врахованого бару або дані починаються після нього"""
+        return history_breaks(to_date_keys(closes), self.last_date, self.last_close)
+
+    def has_returns(self):
+        """Чи достатньо дохідностей для метрик ризику"""
+        return len(self.risk_returns.values) > 1
+
+    def update(self, closes, today=None):
+        """
+        Додає лише нові завершені бари з Series цін закриття.
+        Якщо історію скориговано або між станом і даними є розрив, будує стан заново з переданих даних.
+        """
+        if self.needs_rebuild(closes):
+            self.reset()
+        for date, close in completed_bars(to_date_keys(closes), self.last_date, today).items():
+            self.add_bar(date, float(close))
+
+    def update_benchmark(self, market_symbol, asset_closes, market_closes, today=None):
+        if market_symbol not in self.benchmarks:
+            self.benchmarks[market_symbol] = BenchmarkState()
+        self.benchmarks[market_symbol].update(asset_closes, market_closes, today)
+
+    def get_volatility(self):
+        """Стандартне відхилення денних дохідностей за останні VOLATILITY_WINDOW днів"""
+        return self.volatility.std() if self.volatility.is_full() else math.nan
+
+    def get_volatility_percentile(self):
+        """Перцентиль поточної волатильності серед її значень за останні VOLATILITY_HISTORY днів"""
+        return self.volatility_history.percentile_of(self.get_volatility())
+
+    def get_risk_metrics(self, market_symbol):
+        std = self.risk_returns.std()
+        benchmark = self.benchmarks.get(market_symbol)
+        return {
+            "volatility": std * math.sqrt(TRADING_DAYS),
+            "beta": benchmark.covariance.beta() if benchmark else math.nan,
+            "var_95": self.risk_quantiles.quantile(0.05),
+            "sharpe_ratio": self.risk_returns.mean / std * math.sqrt(TRADING_DAYS) if std > 0 else math.nan
+        }
+
+    def to_dict(self):
+        return {
+            "last_date": self.last_date,
+            "last_close": self.last_close,
+            "volatility": list(self.volatility.values),
+            "volatility_history": list(self.volatility_history.values),
+            "risk_returns": list(self.risk_returns.values),
+            "benchmarks": {symbol: benchmark.to_dict() for symbol, benchmark in self.benchmarks.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.last_date = data["last_date"]
+        state.last_close = data["last_close"]
+        state.volatility = RollingMoments(VOLATILITY_WINDOW, data["volatility"])
+        state.volatility_history = RollingOrderStatistics(VOLATILITY_HISTORY, data["volatility_history"])
+        state.risk_returns = RollingMoments(RISK_WINDOW, data["risk_returns"])
+        state.risk_quantiles = RollingOrderStatistics(RISK_WINDOW, data["risk_returns"])
+        state.benchmarks = {symbol: BenchmarkState.from_dict(benchmark) for symbol, benchmark in data["benchmarks"].items()}
+        return state
+
+
+class IndicatorStore:
+    def __init__(self, db_name='indicators.db'):
+        self.conn = sqlite3.connect(db_name)
+        self.create_table()
+
+    def create_table(self):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS indicator_state
+        (symbol TEXT PRIMARY KEY,
+        state TEXT)
+        ''')
+        self.conn.commit()
+
+    def get_state(self, symbol):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT state FROM indicator_state WHERE symbol = ?', (symbol,))
+        row = cursor.fetchone()
+        return IndicatorState.from_dict(json.loads(row[0])) if row else IndicatorState()
+
+    def save_state(self, symbol, state):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        INSERT OR REPLACE INTO indicator_state (symbol, state)
+        VALUES (?, ?)
+        ''', (symbol, json.dumps(state.to_dict())))
+        self.conn.commit()
+
+    def update(self, symbol, closes):
+        """Просуває стан символу новими барами та зберігає його"""
+        state = self.get_state(symbol)
+        state.update(closes)
+        self.save_state(symbol, state)
+        return state
+
+    def close(self):
+        self.conn.close()
+
+
+indicator_store = None
+
+def get_indicator_store():
+    global indicator_store
+    if indicator_store is None:
+        indicator_store = IndicatorStore()
+    return indicator_store
@@ -1,21 +1,27 @@
 import numpy as np
-import pandas as pd
-from scipy.stats import percentileofscore
 
-def calculate_volatility(historical_data, window=30):
-    """Розрахунок історичної волатильності"""
-    returns = historical_data['Close'].pct_change()
-    return returns.rolling(window=window).std().iloc[-1]
+from investment_indicators import get_indicator_store
 
-def get_recommendation(symbol, last_price, predicted_price, sentiment, historical_data):
-    expected_change = (predicted_price - last_price) / last_price
+BUY_THRESHOLD = 0.05
+SELL_THRESHOLD = -0.05
 
-    volatility = calculate_volatility(historical_data)
+ACTIONS = {1: "купити", -1: "продати", 0: "утримувати"}
 
-    volatility_percentile = percentileofscore(
-        historical_data['Close'].pct_change().rolling(window=30).std(), 
-        volatility
+def get_signal(expected_change, sentiment, buy_threshold=BUY_THRESHOLD, sell_threshold=SELL_THRESHOLD):
+    """
+    Правило сигналу: 1 - купити, -1 - продати, 0 - утримувати.
+    Працює як зі скалярами, так і з масивами NumPy чи pandas.Series.
+    """
+    return np.where(
+        (expected_change > buy_threshold) & (sentiment > 0), 1,
+        np.where((expected_change < sell_threshold) & (sentiment < 0), -1, 0)
     )
+
+def get_recommendation(symbol, last_price, predicted_price, sentiment, historical_data):
+    expected_change = (predicted_price - last_price) / last_price
+
+    indicators = get_indicator_store().update(symbol, historical_data['Close'])
+    volatility_percentile = indicators.get_volatility_percentile()
     
     if volatility_percentile < 33:
         risk_level = "низький"
@@ -24,12 +30,7 @@ def get_recommendation(symbol, last_price, predicted_price, sentiment, historica
     else:
         risk_level = "високий"
 
-    if expected_change > 0.05 and sentiment > 0:
-        action = "купити"
-    elif expected_change < -0.05 and sentiment < 0:
-        action = "продати"
-    else:
-        action = "утримувати"
+    action = ACTIONS[int(get_signal(expected_change, sentiment))]
 
     recommendation = f"Рекомендація для {symbol}:\n"
     recommendation += f"Дія: {action.capitalize()}\n"
@@ -1,43 +1,58 @@
 import yfinance as yf
-import numpy as np
-import pandas as pd
-from scipy import stats
 
-def get_risk_metrics(symbol, market_symbol='^GSPC', period='1mo'):
+from investment_indicators import get_indicator_store, IndicatorState
+
+INITIAL_PERIOD = '1y'
+
+def get_new_closes(symbol, last_date, initial_period=INITIAL_PERIOD):
+    """
+    Завантажує ціни закриття, починаючи з останнього врахованого бару.
+    
+    :param symbol: Символ акції, криптовалюти або індексу
+    :param last_date: Дата останнього бару в стані індикаторів або None
+    :param initial_period: Період історії для першого заповнення стану
+    :return: Series з цінами закриття
     """
-    Розраховує метрики ризику для заданого символу.
+    ticker = yf.Ticker(symbol)
+    if last_date is None:
+        return ticker.history(period=initial_period)['Close']
+    return ticker.history(start=last_date)['Close']
+
+def get_risk_metrics(symbol, market_symbol='^GSPC', period=INITIAL_PERIOD):
+    """
+    Розраховує метрики ризику для заданого символу за останній місяць (RISK_WINDOW торгових днів).
+    Метрики читаються зі стану індикаторів, який доповнюється лише новими барами.
+    Якщо yfinance скоригував історію (спліт, дивіденди), стан будується заново з повної історії.
     
     :param symbol: Символ акції або криптовалюти
     :param market_symbol: Символ для ринкового індексу (за замовчуванням S&P 500)
-    :param period: Період часу для аналізу
-    :return: Словник з метриками ризику
+    :param period: Період історії для першого заповнення стану індикаторів
+    :return: Словник з метриками ризику або None, якщо даних недостатньо
     """
     try:
-        asset = yf.Ticker(symbol)
-        market = yf.Ticker(market_symbol)
-        
-        asset_data = asset.history(period=period)['Close']
-        market_data = market.history(period=period)['Close']
-        
-        asset_returns = asset_data.pct_change().dropna()
-        market_returns = market_data.pct_change().dropna()
+        store = get_indicator_store()
+        indicators = store.get_state(symbol)
         
-        volatility = asset_returns.std() * np.sqrt(252)
+        benchmark = indicators.benchmarks.get(market_symbol)
+        last_dates = [indicators.last_date, benchmark.last_date if benchmark else None]
+        last_date = None if None in last_dates else min(last_dates)
         
-        covariance = np.cov(asset_returns, market_returns)[0][1]
-        market_variance = np.var(market_returns)
-        beta = covariance / market_variance
+        asset_data = get_new_closes(symbol, last_date, period)
+        market_data = get_new_closes(market_symbol, last_date, period)
         
-        var_95 = np.percentile(asset_returns, 5)
+        if indicators.needs_rebuild(asset_data) or (benchmark and benchmark.needs_rebuild(asset_data, market_data)):
+            indicators = IndicatorState()
+            asset_data = get_new_closes(symbol, None, period)
+            market_data = get_new_closes(market_symbol, None, period)
         
-        sharpe_ratio = asset_returns.mean() / asset_returns.std() * np.sqrt(252)
+        indicators.update(asset_data)
+        indicators.update_benchmark(market_symbol, asset_data, market_data)
+        if not indicators.has_returns():
+            print(f"Недостатньо даних для розрахунку метрик ризику для {symbol}")
+            return None
+        store.save_state(symbol, indicators)
         
-        return {
-            "volatility": volatility,
-            "beta": beta,
-            "var_95": var_95,
-            "sharpe_ratio": sharpe_ratio
-        }
+        return indicators.get_risk_metrics(market_symbol)
     except Exception as e:
         print(f"Помилка при розрахунку метрик ризику для {symbol}: {e}")
         return None
@@ -83,12 +98,12 @@ def interpret_risk_metrics(metrics):
     
     return interpretation
 
-def get_risk_assessment(symbol, period='1mo'):
+def get_risk_assessment(symbol, period=INITIAL_PERIOD):
     """
     Отримує та інтерпретує оцінку ризиків для заданого символу.
     
     :param symbol: Символ акції або криптовалюти
-    :param period: Період часу для аналізу
+    :param period: Період історії для першого заповнення стану індикаторів
     :return: Рядок з оцінкою ризиків
     """
     metrics = get_risk_metrics(symbol, period=period)
@@ -1,11 +1,27 @@
 import pandas as pd
+import numpy as np
 import sqlite3
-import torch
-from transformers import AutoTokenizer, AutoModelForQuestionAnswering, pipeline
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from functools import lru_cache
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 import re
 
+TERMS_CSV = 'term_definition.csv'
+KNOWLEDGE_BASE_DIR = 'knowledge_base'
+KNOWLEDGE_BASE_VERSION = 1
+NGRAM_RANGE = (2, 4)
+TERM_WEIGHT = 0.6
+# Найменший поріг без хибних відповідей на сторонні запити, див. benchmark_term_retrieval.py
+SIMILARITY_THRESHOLD = 0.32
+QUERY_CACHE_SIZE = 1024
+
 def create_table_if_not_exists(conn):
     cursor = conn.cursor()
     cursor.execute('''
@@ -17,62 +33,201 @@ def create_table_if_not_exists(conn):
     ''')
     conn.commit()
 
-def load_csv_to_db(csv_file, db_file):
-    df = pd.read_csv(csv_file)
+def create_vectorizer(vocabulary=None):
+    return TfidfVectorizer(
+        analyzer='char_wb',
+        ngram_range=NGRAM_RANGE,
+        sublinear_tf=True,
+        dtype=np.float32,
+        vocabulary=vocabulary
+    )
+
+def get_file_hash(file_path):
+    with open(file_path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def build_term_index(terms_df):
+    """
+    Будує індекс для семантичного пошуку термінів.
     
-    conn = sqlite3.connect(db_file)
+    Терміни та визначення векторизуються символьними n-грамами, тому запити
+    з іншими відмінками чи перефразовані запити все одно знаходять термін.
+    Вектор кожного терміна - зважена сума векторів назви та визначення,
+    нормалізована так, що скалярний добуток дорівнює косинусній схожості.
     
-    create_table_if_not_exists(conn)
+    :param terms_df: DataFrame з колонками term та definition
+    :return: Кортеж (векторизатор, щільна матриця термінів float32)
+    """
+    terms = terms_df['term'].map(preprocess_text)
+    definitions = terms_df['definition'].map(preprocess_text)
     
-    df.to_sql('investment_terms_translated', conn, if_exists='replace', index=False)
+    vectorizer = create_vectorizer()
+    vectorizer.fit(pd.concat([terms, definitions]))
     
-    print(f"Завантажено {len(df)} термінів у базу даних.")
+    term_matrix = TERM_WEIGHT * vectorizer.transform(terms) + (1 - TERM_WEIGHT) * vectorizer.transform(definitions)
+    term_matrix = normalize(term_matrix).astype(np.float32).toarray()
     
-    conn.close()
+    return vectorizer, term_matrix
+
+def get_artifact_dir(csv_hash, artifact_root=KNOWLEDGE_BASE_DIR):
+    return os.path.join(artifact_root, f"v{KNOWLEDGE_BASE_VERSION}-{csv_hash[:16]}")
+
+def prune_artifacts(keep_dir, artifact_root=KNOWLEDGE_BASE_DIR):
+    """
+    Видаляє всі артефакти бази знань, крім keep_dir.
+    Файли, відображені в пам'ять старою базою знань, залишаються доступними, доки вона використовується.
+    """
+    for name in os.listdir(artifact_root):
+        path = os.path.join(artifact_root, name)
+        if name.startswith('v') and os.path.isdir(path) and not os.path.samefile(path, keep_dir):
+            shutil.rmtree(path, ignore_errors=True)
 
-def load_investment_terms(db_file):
+def write_terms_db(terms_df, db_file):
     conn = sqlite3.connect(db_file)
     create_table_if_not_exists(conn)
-    df = pd.read_sql_query("SELECT * FROM investment_terms_translated", conn)
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO investment_terms_translated (id, term, definition) VALUES (?, ?, ?)",
+        [(idx, row.term, row.definition) for idx, row in enumerate(terms_df.itertuples(index=False))]
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_terms_term ON investment_terms_translated (term COLLATE NOCASE)")
+    conn.commit()
     conn.close()
-    return df
-
-model_name = "bert-base-multilingual-cased"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForQuestionAnswering.from_pretrained(model_name)
-nlp = pipeline("question-answering", model=model, tokenizer=tokenizer)
 
-def initialize_nlp_model():
-    model_name = "bert-base-multilingual-cased"
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForQuestionAnswering.from_pretrained(model_name)
+def compile_knowledge_base(csv_file=TERMS_CSV, artifact_root=KNOWLEDGE_BASE_DIR):
+    """
+    Компілює CSV з термінами у версійований артефакт, адресований хешем вмісту CSV:
+    terms.db (SQLite з індексами), vocabulary.npz (словник та idf векторизатора),
+    embeddings.npy (матриця термінів для відображення в пам'ять) та manifest.json.
+    Якщо артефакт для цього вмісту CSV вже існує, він не перебудовується.
     
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print(f"Using device: {device}")
+    :param csv_file: CSV з колонками term та definition
+    :param artifact_root: Каталог з артефактами
+    :return: Шлях до каталогу артефакту
+    :raises ValueError: Якщо CSV не містить жодного терміна
+    """
+    csv_hash = get_file_hash(csv_file)
+    artifact_dir = get_artifact_dir(csv_hash, artifact_root)
+    if os.path.exists(os.path.join(artifact_dir, 'manifest.json')):
+        return artifact_dir
     
-    model = model.to(device)
+    terms_df = pd.read_csv(csv_file)
+    if terms_df.empty:
+        raise ValueError(f"файл термінів {csv_file} не містить жодного терміна")
+    vectorizer, term_matrix = build_term_index(terms_df)
     
-    nlp = pipeline("question-answering", model=model, tokenizer=tokenizer, device=0 if torch.cuda.is_available() else -1)
+    os.makedirs(artifact_root, exist_ok=True)
+    build_dir = tempfile.mkdtemp(dir=artifact_root, prefix='.build-')
+    try:
+        write_terms_db(terms_df, os.path.join(build_dir, 'terms.db'))
+        np.savez(
+            os.path.join(build_dir, 'vocabulary.npz'),
+            vocabulary=vectorizer.get_feature_names_out().astype(str),
+            idf=vectorizer.idf_
+        )
+        np.save(os.path.join(build_dir, 'embeddings.npy'), term_matrix)
+        with open(os.path.join(build_dir, 'manifest.json'), 'w', encoding='utf-8') as manifest:
+            json.dump({
+                "version": KNOWLEDGE_BASE_VERSION,
+                "csv_hash": csv_hash,
+                "terms": len(terms_df),
+                "features": len(vectorizer.idf_),
+                "created_at": datetime.now().isoformat()
+            }, manifest, ensure_ascii=False, indent=2)
+        os.replace(build_dir, artifact_dir)
+    except OSError:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(artifact_dir, 'manifest.json')):
+            raise
     
-    return nlp
+    print(f"Базу знань скомпільовано у {artifact_dir}: {len(terms_df)} термінів")
+    return artifact_dir
+
+
+class KnowledgeBase:
+    """
+    Завантажений артефакт бази знань. Не змінюється після створення, тому гаряче
+    оновлення лише підміняє посилання на новий об'єкт, а запити, що вже виконуються,
+    дочитують старий.
+    """
 
+    def __init__(self, artifact_dir):
+        with open(os.path.join(artifact_dir, 'manifest.json'), encoding='utf-8') as manifest:
+            self.manifest = json.load(manifest)
+        self.csv_hash = self.manifest['csv_hash']
+        
+        conn = sqlite3.connect(os.path.join(artifact_dir, 'terms.db'))
+        cursor = conn.cursor()
+        cursor.execute("SELECT term, definition FROM investment_terms_translated ORDER BY id")
+        self.terms = [{'term': term, 'definition': definition} for term, definition in cursor.fetchall()]
+        conn.close()
+        
+        with np.load(os.path.join(artifact_dir, 'vocabulary.npz')) as vocabulary:
+            self.vectorizer = create_vectorizer(vocabulary=vocabulary['vocabulary'].tolist())
+            self.vectorizer.idf_ = vocabulary['idf']
+        self.embeddings = np.load(os.path.join(artifact_dir, 'embeddings.npy'), mmap_mode='r')
+        
+        self.search = lru_cache(maxsize=QUERY_CACHE_SIZE)(self.search_uncached)
 
-terms_df = None
-vectorizer = None
-term_vectors = None
+    def search_uncached(self, query, top_k=1):
+        """
+        Шукає найближчі до запиту терміни одним множенням матриці на вектор.
+        
+        :param query: Попередньо оброблений текст запиту
+        :param top_k: Кількість термінів у результаті
+        :return: Кортеж пар (індекс терміна, схожість), відсортований за спаданням схожості
+        """
+        query_vector = self.vectorizer.transform([query]).toarray()[0]
+        similarities = self.embeddings @ query_vector
+        
+        top_k = min(top_k, len(similarities))
+        top_indices = np.argpartition(-similarities, top_k - 1)[:top_k]
+        top_indices = top_indices[np.argsort(-similarities[top_indices])]
+        return tuple((int(idx), float(similarities[idx])) for idx in top_indices)
 
 
-def initialize_term_data(db_file):
-    global terms_df, vectorizer, term_vectors, nlp
-    terms_df = load_investment_terms(db_file)
+knowledge_base = None
+knowledge_base_mtime = None
+
+def initialize_term_data(csv_file=TERMS_CSV, artifact_root=KNOWLEDGE_BASE_DIR):
+    global knowledge_base, knowledge_base_mtime
+    if not os.path.exists(csv_file):
+        print(f"Помилка: файл термінів {csv_file} не знайдено")
+        return False
     
-    if terms_df.empty:
-        print("Помилка: База даних термінів порожня")
+    knowledge_base_mtime = os.path.getmtime(csv_file)
+    try:
+        artifact_dir = compile_knowledge_base(csv_file, artifact_root)
+        knowledge_base = KnowledgeBase(artifact_dir)
+    except (ValueError, pd.errors.ParserError, OSError) as e:
+        print(f"Помилка при завантаженні бази знань: {e}")
+        return False
+    
+    prune_artifacts(artifact_dir, artifact_root)
+    return True
+
+def reload_knowledge_base(csv_file=TERMS_CSV, artifact_root=KNOWLEDGE_BASE_DIR):
+    """
+    Перекомпільовує та підміняє базу знань, якщо CSV змінився. Безпечно викликати з окремого потоку.
+    Час зміни CSV запам'ятовується й тоді, коли компіляція не вдалась, тож зламаний файл
+    не розбирається повторно, доки його не змінять.
+    
+    :return: True, якщо базу знань оновлено
+    """
+    global knowledge_base, knowledge_base_mtime
+    csv_mtime = os.path.getmtime(csv_file)
+    if csv_mtime == knowledge_base_mtime:
+        return False
+    
+    if knowledge_base is not None and get_file_hash(csv_file) == knowledge_base.csv_hash:
+        knowledge_base_mtime = csv_mtime
         return False
     
-    vectorizer = TfidfVectorizer()
-    term_vectors = vectorizer.fit_transform(terms_df['term'])
-    nlp = initialize_nlp_model()
+    knowledge_base_mtime = csv_mtime
+    artifact_dir = compile_knowledge_base(csv_file, artifact_root)
+    knowledge_base = KnowledgeBase(artifact_dir)
+    prune_artifacts(artifact_dir, artifact_root)
+    print(f"Базу знань оновлено: {len(knowledge_base.terms)} термінів")
     return True
 
 def preprocess_text(text):
@@ -80,16 +235,18 @@ def preprocess_text(text):
     text = re.sub(r'\s+', ' ', text).strip()
     return text.lower()
 
+def search_terms(query, top_k=1):
+    if knowledge_base is None:
+        raise ValueError("Дані термінів не були ініціалізовані.")
+    return knowledge_base.search(query, top_k)
+
 def find_most_relevant_term(query):
-    global vectorizer, term_vectors, terms_df
-    if vectorizer is None or term_vectors is None or terms_df is None:
+    current_knowledge_base = knowledge_base
+    if current_knowledge_base is None:
         raise ValueError("Дані термінів не були ініціалізовані.")
     
-    query = preprocess_text(query)
-    query_vector = vectorizer.transform([query])
-    similarities = cosine_similarity(query_vector, term_vectors)
-    most_similar_idx = similarities.argmax()
-    return terms_df.iloc[most_similar_idx], similarities[0][most_similar_idx]
+    most_similar_idx, similarity = current_knowledge_base.search(preprocess_text(query))[0]
+    return current_knowledge_base.terms[most_similar_idx], similarity
 
 def extract_key_information(definition, query):
     sentences = re.split(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?)\s', definition)
@@ -105,13 +262,9 @@ def extract_key_information(definition, query):
     return ' '.join(relevant_sentences) if relevant_sentences else definition
 
 def generate_answer(query):
-    global nlp
-    if nlp is None:
-        raise ValueError("NLP модель не була ініціалізована.")
-    
     relevant_term, similarity_score = find_most_relevant_term(query)
     
-    if similarity_score < 0.3:
+    if similarity_score < SIMILARITY_THRESHOLD:
         return "Вибачте, я не можу знайти релевантну інформацію для цього запиту.", None
     
     key_info = extract_key_information(relevant_term['definition'], query)
@@ -137,9 +290,13 @@ def get_investment_term_explanation(query):
     return response
 
 
-def initialize_bot_data(db_file):
-    success = initialize_term_data(db_file)
+def initialize_bot_data(csv_file=TERMS_CSV):
+    success = initialize_term_data(csv_file)
     if not success:
         print("Помилка ініціалізації даних для бота")
     else:
         print("Дані для бота успішно ініціалізовані")
+
+
+if __name__ == '__main__':
+    compile_knowledge_base(sys.argv[1] if len(sys.argv) > 1 else TERMS_CSV)
@@ -0,0 +1,332 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from telegram import Update
+from telegram.ext import ApplicationBuilder
+from telegram.request import BaseRequest
+
+import main as bot
+import historical_data_and_visualization
+import investment_indicators
+import investment_risk_assessment
+import stock_price_prediction_model
+from investment_indicators import IndicatorStore
+from investment_terms_nlp import initialize_bot_data
+from model_lifecycle import current_rss_bytes, create_prediction_pool, PREDICTION_WORKER_MAX_JOBS
+from user_profile_system import UserProfileManager, InvestmentExperience, InvestmentGoal
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "LoadTestBot", "username": "load_test_bot"}
+
+SYMBOLS = ["AAPL", "MSFT", "GOOGL", "TSLA", "BTC-USD", "ETH-USD"]
+TERM_QUERIES = ["що таке облігація", "дивіденди", "волатильність", "хедж фонди", "що таке ф'ючерси", "диверсифікація", "привіт"]
+
+DEFAULT_MIX = "price=30,history=10,risk=10,analyze=5,term=35,profile=10"
+
+# Кількість відповідей бота, після якої повідомлення вважається обробленим
+EXPECTED_REPLIES = {"analyze": 2}
+REPLY_TIMEOUT = 300
+
+PERIOD_DAYS = {"1d": 1, "5d": 5, "1mo": 30, "3mo": 90, "6mo": 180, "1y": 365, "2y": 730, "5y": 1825, "10y": 3650, "ytd": 365, "max": 3650}
+
+
+class FakeRequest(BaseRequest):
+    """Бекенд Bot API, що відповідає на запити бота без мережі та повідомляє про кожну відповідь бота"""
+
+    def __init__(self, on_reply=None):
+        self.message_id = 0
+        self.on_reply = on_reply
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit('/', 1)[-1]
+        if endpoint == 'getMe':
+            result = BOT_USER
+        elif endpoint.startswith('send'):
+            parameters = request_data.parameters if request_data else {}
+            chat_id = int(parameters.get('chat_id', 0))
+            self.message_id += 1
+            result = {
+                "message_id": self.message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+            }
+            if self.on_reply:
+                self.on_reply(chat_id)
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+class FakeMarket:
+    """Синтетичні ринкові дані замість yfinance із затримкою, що імітує мережевий запит"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def prices(self, symbol, days):
+        time.sleep(self.latency)
+        index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=max(days * 5 // 7, 2))
+        rng = np.random.default_rng(sum(map(ord, symbol)))
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, len(index))))
+        return pd.DataFrame({
+            "Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+            "Volume": rng.integers(1_000_000, 5_000_000, len(index)),
+        }, index=index.rename("Date"))
+
+    def Ticker(self, symbol):
+        return SimpleNamespace(
+            history=lambda period="1mo", **kwargs: self.prices(symbol, PERIOD_DAYS.get(period, 30)),
+            info={"longName": symbol},
+        )
+
+    def download(self, symbol, start=None, end=None, **kwargs):
+        days = (pd.Timestamp(end) - pd.Timestamp(start)).days if start and end else 365
+        return self.prices(symbol, days)
+
+
+def fake_company_news(company_name, api_key):
+    return [{"title": f"{company_name} shares rise", "description": "Strong quarterly results"}]
+
+def fake_train_and_predict(symbol, start_date, end_date, look_back=60, time_budget=None, requested_at=None):
+    last_price = 100.0
+    training_info = {"epochs": 0, "best_epoch": 0, "val_loss": 0.0, "training_time": 0.0, "batch_size": 0, "stopped_by": "stub", "request_time": 0.0}
+    return last_price, last_price * random.uniform(0.9, 1.1), random.uniform(-0.5, 0.5), training_info
+
+def install_worker_stubs(market_latency):
+    """Ініціалізатор робочого процесу прогнозування: ті самі синтетичні ринкові дані та новини, що й в основному процесі"""
+    stock_price_prediction_model.yf = FakeMarket(market_latency)
+    stock_price_prediction_model.get_company_news = fake_company_news
+
+def install_stubs(market_latency, train):
+    market = FakeMarket(market_latency)
+    for module in (bot, historical_data_and_visualization, investment_risk_assessment, stock_price_prediction_model):
+        module.yf = market
+    stock_price_prediction_model.get_company_news = fake_company_news
+    if not train:
+        stock_price_prediction_model.train_and_predict = fake_train_and_predict
+    bot.profile_manager = UserProfileManager(':memory:')
+    investment_indicators.indicator_store = IndicatorStore(':memory:')
+
+
+def scenario_messages(scenario):
+    symbol = random.choice(SYMBOLS)
+    if scenario == "price":
+        return [f"/price {symbol}"]
+    if scenario == "history":
+        return [f"/history {symbol} {random.choice(['1mo', '3mo', '1y'])}"]
+    if scenario == "risk":
+        return [f"/risk {symbol}"]
+    if scenario == "analyze":
+        return [f"/analyze {symbol}"]
+    if scenario == "term":
+        return [random.choice(TERM_QUERIES)]
+    if scenario == "profile":
+        return [
+            "/create_profile",
+            random.choice(list(InvestmentExperience)).value,
+            random.choice(list(InvestmentGoal)).value,
+            str(random.randint(1, 10)),
+        ]
+    raise ValueError(f"Невідомий сценарій: {scenario}")
+
+def parse_mix(mix):
+    weights = {}
+    for item in mix.split(','):
+        scenario, weight = item.split('=')
+        scenario_messages(scenario.strip())
+        weights[scenario.strip()] = float(weight)
+    return weights
+
+
+class LoadTest:
+    def __init__(self, application, rate, duration, users, mix):
+        self.application = application
+        self.rate = rate
+        self.duration = duration
+        self.free_users = list(range(1000, 1000 + users))
+        self.scenarios = list(mix)
+        self.weights = list(mix.values())
+        self.update_id = 0
+        self.latencies = defaultdict(list)
+        self.pending_replies = {}
+        self.errors = 0
+        self.timeouts = 0
+        self.dropped = 0
+        self.loop_lag = []
+        self.memory = []
+
+    def make_update(self, user_id, text):
+        self.update_id += 1
+        message = {
+            "message_id": self.update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+            "text": text,
+        }
+        if text.startswith('/'):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return Update.de_json({"update_id": self.update_id, "message": message}, self.application.bot)
+
+    async def on_error(self, update, context):
+        self.errors += 1
+
+    def on_reply(self, chat_id):
+        pending = self.pending_replies.get(chat_id)
+        if pending is None:
+            return
+        pending[0] -= 1
+        if pending[0] == 0 and not pending[1].done():
+            pending[1].set_result(time.perf_counter())
+
+    async def send(self, user_id, text, replies):
+        """
+        Ставить повідомлення в update_queue, як це робить опитування Telegram, і чекає на відповіді бота.
+
+        :return: Затримка від постановки в чергу до останньої очікуваної відповіді, с, або None при тайм-ауті
+        """
+        replied = asyncio.get_running_loop().create_future()
+        self.pending_replies[user_id] = [replies, replied]
+        started = time.perf_counter()
+        await self.application.update_queue.put(self.make_update(user_id, text))
+        try:
+            return await asyncio.wait_for(replied, REPLY_TIMEOUT) - started
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return None
+        finally:
+            del self.pending_replies[user_id]
+
+    async def run_session(self, scenario):
+        user_id = self.free_users.pop()
+        try:
+            for text in scenario_messages(scenario):
+                latency = await self.send(user_id, text, EXPECTED_REPLIES.get(scenario, 1))
+                if latency is None:
+                    break
+                self.latencies[scenario].append(latency)
+        finally:
+            self.free_users.append(user_id)
+
+    async def monitor(self, interval=0.1):
+        started = time.perf_counter()
+        while True:
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            self.loop_lag.append(now - expected)
+            if not self.memory or now - started - self.memory[-1][0] >= 1:
+                self.memory.append((now - started, current_rss_bytes(), sum(map(len, self.latencies.values()))))
+
+    async def run(self):
+        self.application.add_error_handler(self.on_error)
+        monitor = asyncio.create_task(self.monitor())
+        sessions = set()
+
+        started = time.perf_counter()
+        while time.perf_counter() - started < self.duration:
+            await asyncio.sleep(random.expovariate(self.rate))
+            if not self.free_users:
+                self.dropped += 1
+                continue
+            scenario = random.choices(self.scenarios, self.weights)[0]
+            session = asyncio.create_task(self.run_session(scenario))
+            sessions.add(session)
+            session.add_done_callback(sessions.discard)
+
+        await asyncio.gather(*sessions)
+        elapsed = time.perf_counter() - started
+        monitor.cancel()
+        return elapsed
+
+    def report(self, elapsed):
+        total = sum(map(len, self.latencies.values()))
+        lines = [
+            f"Тривалість: {elapsed:.1f} с, оброблено повідомлень: {total}, пропускна здатність: {total / elapsed:.1f} повідомлень/с",
+            f"Помилки обробників: {self.errors}, без відповіді за {REPLY_TIMEOUT} с: {self.timeouts}, "
+            f"відкинуто сесій (немає вільних користувачів): {self.dropped}",
+            "",
+            f"{'команда':<10}{'кількість':>10}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'max, мс':>10}",
+        ]
+        for scenario, latencies in sorted(self.latencies.items()):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+            lines.append(f"{scenario:<10}{len(latencies):>10}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{max(latencies) * 1000:>10.1f}")
+
+        if self.loop_lag:
+            lag_p50, lag_p99 = np.percentile(self.loop_lag, [50, 99]) * 1000
+            lines += ["", f"Затримка циклу подій: p50 {lag_p50:.1f} мс, p99 {lag_p99:.1f} мс, max {max(self.loop_lag) * 1000:.1f} мс"]
+
+        if self.memory:
+            lines += ["", "Пам'ять (RSS) у часі:"]
+            samples = self.memory[::max(len(self.memory) // 10, 1)]
+            if samples[-1] is not self.memory[-1]:
+                samples.append(self.memory[-1])
+            for seconds, rss, processed in samples:
+                lines.append(f"  {seconds:>6.1f} с  {rss / 2**20:>8.1f} МБ  оброблено {processed}")
+            growth = self.memory[-1][1] - self.memory[0][1]
+            lines.append(f"Приріст пам'яті: {growth / 2**20:.1f} МБ")
+
+        return '\n'.join(lines)
+
+
+async def run_load_test(args):
+    request = FakeRequest()
+    # Як у main(): оновлення обробляються по одному з update_queue, а справжня модель (--train)
+    # навчається в пулі процесів, якщо --max-jobs більше 0
+    if args.train:
+        bot.prediction_pool = create_prediction_pool(args.max_jobs, initializer=install_worker_stubs, initargs=(args.market_latency,))
+    application = ApplicationBuilder().token("123456:LOADTEST").request(request).get_updates_request(FakeRequest()).build()
+    bot.add_handlers(application)
+
+    load_test = LoadTest(application, args.rate, args.duration, args.users, parse_mix(args.mix))
+    request.on_reply = load_test.on_reply
+    try:
+        async with application:
+            await application.start()
+            elapsed = await load_test.run()
+            await application.stop()
+    finally:
+        if bot.prediction_pool is not None:
+            bot.prediction_pool.shutdown()
+    return load_test.report(elapsed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Навантажувальне тестування бота синтетичним трафіком Telegram")
+    parser.add_argument("--rate", type=float, default=50, help="Цільова кількість нових сесій за секунду")
+    parser.add_argument("--duration", type=float, default=60, help="Тривалість генерації трафіку, с")
+    parser.add_argument("--users", type=int, default=500, help="Кількість одночасних користувачів")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Ваги сценаріїв, наприклад price=30,term=70")
+    parser.add_argument("--market-latency", type=float, default=0.0, help="Імітована затримка запиту ринкових даних, с")
+    parser.add_argument("--train", action="store_true", help="Навчати справжню модель у /analyze замість заглушки")
+    parser.add_argument("--max-jobs", type=int, default=PREDICTION_WORKER_MAX_JOBS,
+                        help="Прогнозів на робочий процес для --train; 0 - навчати в циклі подій, як main() з PREDICTION_WORKER_MAX_JOBS=0")
+    parser.add_argument("--csv", default="term_definition.csv")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    install_stubs(args.market_latency, args.train)
+
+    initialize_bot_data(args.csv)
+    print(asyncio.run(run_load_test(args)))
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,17 @@
+import asyncio
 import logging
 import sqlite3
+import time
 from historical_data_and_visualization import get_historical_data_and_chart
-from investment_terms_nlp import get_investment_term_explanation, initialize_bot_data
+from investment_terms_nlp import get_investment_term_explanation, initialize_bot_data, reload_knowledge_base, TERMS_CSV
 import yfinance as yf
 import requests_cache
 from datetime import datetime, timedelta
+from concurrent.futures.process import BrokenProcessPool
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters,ConversationHandler
-from stock_price_prediction_model import train_and_predict
+from stock_price_prediction_model import train_and_predict_with_metrics
+from model_lifecycle import create_prediction_pool
 from investment_recommendation_system import generate_investment_recommendation
 from user_profile_system import UserProfileManager, UserProfile, InvestmentExperience, InvestmentGoal, get_personalized_recommendation
 from investment_risk_assessment import get_risk_assessment
@@ -24,6 +28,11 @@ logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s
 
 profile_manager = UserProfileManager()
 
+prediction_pool = None
+
+KNOWLEDGE_BASE_RELOAD_INTERVAL = int(os.getenv('KNOWLEDGE_BASE_RELOAD_INTERVAL', 60))
+knowledge_base_watcher = None
+
 EXPERIENCE, GOAL, RISK = range(3)
 
 async def start_profile_creation(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -72,6 +81,31 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Створення профілю скасовано.", reply_markup=ReplyKeyboardRemove())
     return ConversationHandler.END
 
+async def run_prediction(symbol, start_date, end_date):
+    """
+    Навчає модель у пулі процесів, якщо його ввімкнено через PREDICTION_WORKER_MAX_JOBS, інакше - в основному процесі.
+    Якщо робочий процес аварійно завершився (наприклад, через нестачу пам'яті), пул створюється заново.
+    Бюджет часу прогнозу рахується від цього виклику, включно з очікуванням і запуском робочого процесу.
+    """
+    global prediction_pool
+    requested_at = time.time()
+    if prediction_pool is None:
+        result, cache_metrics = train_and_predict_with_metrics(symbol, start_date, end_date, requested_at)
+    else:
+        pool = prediction_pool
+        try:
+            result, cache_metrics = await asyncio.get_running_loop().run_in_executor(
+                pool, train_and_predict_with_metrics, symbol, start_date, end_date, requested_at
+            )
+        except BrokenProcessPool:
+            if prediction_pool is pool:
+                logging.error("Робочий процес прогнозування аварійно завершився, пул процесів створено заново")
+                pool.shutdown(wait=False)
+                prediction_pool = create_prediction_pool()
+            raise
+    logging.info(f"Моделі в пам'яті: {cache_metrics}")
+    return result
+
 async def predict_and_recommend(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if len(context.args) < 1:
         await update.message.reply_text("Будь ласка, вкажіть символ акції після команди /analyze")
@@ -85,7 +119,8 @@ async def predict_and_recommend(update: Update, context: ContextTypes.DEFAULT_TY
 
     try:
         historical_data = yf.download(symbol, start=start_date, end=end_date)
-        last_price, predicted_price, sentiment = train_and_predict(symbol, start_date, end_date)
+        last_price, predicted_price, sentiment, training_info = await run_prediction(symbol, start_date, end_date)
+        logging.info(f"Навчання моделі для {symbol}: {training_info}")
         
         user_profile = profile_manager.get_profile(update.effective_user.id)
         if user_profile:
@@ -211,7 +246,8 @@ async def predict(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(f"Починаю прогнозування для {symbol}. Це може зайняти кілька хвилин...")
 
     try:
-        last_price, predicted_price, sentiment = train_and_predict(symbol, start_date, end_date)
+        last_price, predicted_price, sentiment, training_info = await run_prediction(symbol, start_date, end_date)
+        logging.info(f"Навчання моделі для {symbol}: {training_info}")
         percent_change = ((predicted_price - last_price) / last_price) * 100
 
         response = f"Прогноз для {symbol}:\n"
@@ -233,11 +269,31 @@ async def predict(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"Вибачте, сталася помилка при прогнозуванні для {symbol}. Будь ласка, спробуйте ще раз пізніше або зверніться до адміністратора.")
 
 
-def main():
-    db_file = 'investment_knowledge.db'
-    initialize_bot_data(db_file)
-    application = ApplicationBuilder().token(telegram_token).build()
+async def watch_knowledge_base(csv_file, interval=KNOWLEDGE_BASE_RELOAD_INTERVAL):
+    """Періодично перевіряє CSV з термінами та перекомпільовує базу знань в окремому потоці, не блокуючи запити"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(reload_knowledge_base, csv_file)
+        except Exception as e:
+            logging.error(f"Помилка при оновленні бази знань, залишаю попередню: {e}")
+
+async def start_background_tasks(application):
+    global knowledge_base_watcher
+    knowledge_base_watcher = asyncio.create_task(watch_knowledge_base(TERMS_CSV))
 
+async def stop_background_tasks(application):
+    """Скасовує фонові задачі до закриття циклу подій, щоб вони не залишались незавершеними"""
+    if knowledge_base_watcher is None:
+        return
+    knowledge_base_watcher.cancel()
+    try:
+        await knowledge_base_watcher
+    except asyncio.CancelledError:
+        pass
+
+
+def add_handlers(application):
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler('create_profile', start_profile_creation)],
         states={
@@ -257,6 +313,14 @@ def main():
     application.add_handler(CommandHandler("analyze", predict_and_recommend))
     application.add_handler(CommandHandler("risk", assess_risk))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+
+
+def main():
+    global prediction_pool
+    initialize_bot_data(TERMS_CSV)
+    prediction_pool = create_prediction_pool()
+    application = ApplicationBuilder().token(telegram_token).post_init(start_background_tasks).post_stop(stop_background_tasks).build()
+    add_handlers(application)
     
     application.run_polling()
 
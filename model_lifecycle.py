@@ -0,0 +1,113 @@
+import gc
+import multiprocessing
+import os
+import resource
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import tensorflow as tf
+
+# Кількість навчених моделей у кеші. Ваги моделі займають сотні КБ, але разом із графами
+# та станом TensorFlow кожна модель додає до RSS процесу 15-25 МБ (заміряно soak_test_model_memory.py),
+# тож 4 моделі - це приблизно 100 МБ понад базовий розмір процесу
+MODEL_CACHE_SIZE = int(os.getenv('MODEL_CACHE_SIZE', 4))
+
+# TensorFlow не повертає частину пам'яті навіть після clear_session (близько 15 МБ на прогноз),
+# тому робочий процес перезапускається після стількох прогнозів; 0 - навчати в основному процесі
+PREDICTION_WORKER_MAX_JOBS = int(os.getenv('PREDICTION_WORKER_MAX_JOBS', 10))
+
+def clear_keras_session():
+    """Звільняє глобальний стан Keras та пам'ять моделей, на які вже не залишилось посилань"""
+    tf.keras.backend.clear_session()
+    gc.collect()
+
+def current_rss_bytes():
+    """Поточний резидентний розмір процесу (на Linux), інакше - піковий"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelCache:
+    """
+    LRU-кеш навчених моделей з обмеженням їх кількості.
+    Моделі понад max_models витісняються від найдавніше використаних,
+    а їхні графи Keras звільняються.
+    """
+
+    def __init__(self, max_models=MODEL_CACHE_SIZE):
+        self.max_models = max_models
+        self.models = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        :param key: Ключ моделі
+        :return: Кортеж (модель, scaler, метадані навчання) або None
+        """
+        if key not in self.models:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.models.move_to_end(key)
+        return self.models[key]
+
+    def put(self, key, model, scaler, training_info):
+        """
+        Додає модель до кешу та витісняє давні моделі, якщо їх більше за max_models.
+
+        :return: True, якщо модель залишилась у кеші; False, якщо кеш вимкнено (max_models = 0)
+        """
+        if self.max_models <= 0:
+            return False
+        if key in self.models:
+            self.evict(key)
+
+        self.models[key] = (model, scaler, training_info)
+        while len(self.models) > self.max_models:
+            self.evict(next(iter(self.models)))
+        return True
+
+    def evict(self, key):
+        del self.models[key]
+        self.evictions += 1
+        clear_keras_session()
+
+    def clear(self):
+        while self.models:
+            self.evict(next(iter(self.models)))
+
+    def get_metrics(self):
+        return {
+            "resident_models": len(self.models),
+            "max_models": self.max_models,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "rss_bytes": current_rss_bytes(),
+        }
+
+
+model_cache = ModelCache()
+
+def create_prediction_pool(max_jobs=PREDICTION_WORKER_MAX_JOBS, max_workers=1, initializer=None, initargs=()):
+    """
+    Пул процесів для навчання моделей, у якому кожен процес перезапускається після max_jobs задач,
+    тож пам'ять, яку не повертає TensorFlow, звільняється разом із процесом.
+
+    :param max_jobs: Кількість задач на один процес; 0 - навчати в основному процесі без пулу
+    :param initializer: Функція, що виконується в кожному новому робочому процесі
+    :return: ProcessPoolExecutor або None
+    """
+    if max_jobs <= 0:
+        return None
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        max_tasks_per_child=max_jobs,
+        initializer=initializer,
+        initargs=initargs
+    )
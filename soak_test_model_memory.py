@@ -0,0 +1,78 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from model_lifecycle import model_cache, current_rss_bytes, create_prediction_pool, PREDICTION_WORKER_MAX_JOBS
+from stock_price_prediction_model import predict_with_cached_model
+
+def soak_job(iteration, symbols, days, look_back):
+    """Один прогноз на синтетичних даних; повертає RSS та PID процесу, який його виконав"""
+    rng = np.random.default_rng(iteration)
+    data = pd.DataFrame({
+        'close': 100 * np.exp(np.cumsum(rng.normal(0, 0.02, days))),
+        'sentiment': rng.uniform(-1, 1)
+    })
+    key = (f"SYM{iteration % symbols}", iteration // symbols, look_back)
+    predict_with_cached_model(key, data, look_back, time_budget=0)
+    return current_rss_bytes(), os.getpid()
+
+def run_soak_test(iterations, symbols, days, look_back, sample_every, max_jobs):
+    """
+    Багаторазово навчає та використовує моделі через кеш і записує RSS процесу, що їх виконує.
+    Кількість символів більша за місткість кешу, тому моделі постійно витісняються.
+
+    :param max_jobs: Перезапускати робочий процес після max_jobs прогнозів; 0 - прогнозувати в цьому процесі
+    :return: Список RSS у байтах після кожного прогнозу
+    """
+    pool = create_prediction_pool(max_jobs)
+    rss_samples = []
+    workers = set()
+    started = time.perf_counter()
+    try:
+        for iteration in range(1, iterations + 1):
+            if pool is None:
+                rss, pid = soak_job(iteration, symbols, days, look_back)
+            else:
+                rss, pid = pool.submit(soak_job, iteration, symbols, days, look_back).result()
+            rss_samples.append(rss)
+            workers.add(pid)
+            if iteration % sample_every == 0:
+                window = rss_samples[-sample_every:]
+                print(f"{iteration:>6}  {time.perf_counter() - started:>8.1f} с  RSS max {max(window) / 2**20:>8.1f} МБ  "
+                      f"основний процес {current_rss_bytes() / 2**20:>8.1f} МБ  робочих процесів {len(workers)}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return rss_samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Перевірка, що пам'ять бота не зростає з кількістю прогнозів")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--look-back", type=int, default=20)
+    parser.add_argument("--sample-every", type=int, default=100)
+    parser.add_argument("--max-jobs", type=int, default=PREDICTION_WORKER_MAX_JOBS, help="Прогнозів на робочий процес; 0 - без пулу процесів")
+    parser.add_argument("--cache-size", type=int, default=4, help="Кількість моделей у кеші")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Допустимий відносний приріст RSS")
+    args = parser.parse_args()
+
+    # Робочі процеси створюються через spawn і читають розмір кешу зі змінної середовища
+    os.environ['MODEL_CACHE_SIZE'] = str(args.cache_size)
+    model_cache.max_models = args.cache_size
+
+    rss_samples = run_soak_test(args.iterations, args.symbols, args.days, args.look_back, args.sample_every, args.max_jobs)
+
+    # Перша чверть прогнозів - прогрів (імпорт TensorFlow, трасування графів, заповнення кешу)
+    quarter = max(len(rss_samples) // 4, 1)
+    early_peak = max(rss_samples[quarter:2 * quarter] or rss_samples)
+    late_peak = max(rss_samples[-quarter:])
+    growth = late_peak / early_peak - 1
+    print(f"Пік RSS: {early_peak / 2**20:.1f} МБ після прогріву, {late_peak / 2**20:.1f} МБ наприкінці, приріст {growth:.1%}")
+    sys.exit(0 if growth <= args.tolerance else 1)
+
+if __name__ == '__main__':
+    main()
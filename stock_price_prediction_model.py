@@ -1,4 +1,5 @@
 import os
+import time
 import nltk
 from textblob import TextBlob
 import pandas as pd
@@ -8,18 +9,28 @@ from sklearn.preprocessing import MinMaxScaler
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense
 from tensorflow.keras.optimizers.legacy import Adam
+from tensorflow.keras.callbacks import Callback, EarlyStopping
 import requests
 import numpy as np
 from dotenv import load_dotenv
 
+from model_lifecycle import model_cache, clear_keras_session
+
 load_dotenv() 
 news_api_key = os.getenv('NEWS_API_KEY')
 
 nltk.download('punkt')
 
+MAX_EPOCHS = 50
+VALIDATION_SPLIT = 0.1
+EARLY_STOPPING_PATIENCE = 5
+# Бюджет часу на весь запит прогнозу: завантаження даних, новини та навчання моделі
+TRAINING_TIME_BUDGET = 60
+NEWS_API_TIMEOUT = 10
+
 def get_company_news(company_name, api_key):
     url = f"https://newsapi.org/v2/everything?q={company_name}&apiKey={api_key}&language=en"
-    response = requests.get(url)
+    response = requests.get(url, timeout=NEWS_API_TIMEOUT)
     if response.status_code == 200:
         return response.json()['articles']
     else:
@@ -41,7 +52,7 @@ def get_stock_data(symbol, start_date, end_date, news_api_key = news_api_key):
     df = df.rename(columns={'Date': 'date', 'Close': 'close'})
     
     company_name = yf.Ticker(symbol).info['longName']
-    df['sentiment'] = [get_company_sentiment(company_name, news_api_key) for _ in range(len(df))]
+    df['sentiment'] = get_company_sentiment(company_name, news_api_key)
     
     return df
 
@@ -72,21 +83,130 @@ def predict_price(model, data, scaler, look_back):
     last_data_scaled = scaler.transform(last_data)
     X_test = np.array([last_data_scaled])
     
-    predicted_price_scaled = model.predict(X_test)
+    predicted_price_scaled = model.predict(X_test, verbose=0)
     predicted_price = scaler.inverse_transform(np.hstack((predicted_price_scaled, X_test[0, -1, 1].reshape(-1, 1))))[0, 0]
     
     return predicted_price
 
-def train_and_predict(symbol, start_date, end_date, look_back=60):
-    data = get_stock_data(symbol, start_date, end_date)
+class TimeBudget(Callback):
+    """Зупиняє навчання, якщо наступна епоха не вкладеться в бюджет часу (у секундах)"""
+
+    def __init__(self, budget):
+        super().__init__()
+        self.budget = budget
+        self.exhausted = False
+
+    def on_train_begin(self, logs=None):
+        self.started = time.monotonic()
+        self.epoch_started = self.started
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_started = time.monotonic()
+
+    def on_epoch_end(self, epoch, logs=None):
+        now = time.monotonic()
+        if now - self.started + (now - self.epoch_started) > self.budget:
+            self.exhausted = True
+            self.model.stop_training = True
+
+def choose_batch_size(samples):
+    """Розмір батчу - степінь двійки, що дає близько 20 кроків на епоху"""
+    return int(np.clip(2 ** round(np.log2(max(samples, 1) / 20)), 16, 256))
+
+def train_model(X, y, time_budget=TRAINING_TIME_BUDGET):
+    """
+    Навчає модель з валідацією на останніх спостереженнях, ранньою зупинкою та бюджетом часу.
+    
+    :param X: Вхідні послідовності
+    :param y: Цільові значення
+    :param time_budget: Максимальний час навчання в секундах; одна епоха виконується завжди
+    :return: Кортеж (модель, словник з метаданими навчання)
+    """
+    validation_size = max(int(len(X) * VALIDATION_SPLIT), 1)
+    X_train, X_val = X[:-validation_size], X[-validation_size:]
+    y_train, y_val = y[:-validation_size], y[-validation_size:]
+    batch_size = choose_batch_size(len(X_train))
+    
+    model = create_model(X.shape[1], X.shape[2])
+    early_stopping = EarlyStopping(monitor='val_loss', patience=EARLY_STOPPING_PATIENCE, restore_best_weights=True)
+    time_budget_callback = TimeBudget(time_budget)
+    
+    started = time.monotonic()
+    history = model.fit(
+        X_train, y_train,
+        validation_data=(X_val, y_val),
+        epochs=MAX_EPOCHS,
+        batch_size=batch_size,
+        callbacks=[early_stopping, time_budget_callback],
+        verbose=0
+    )
+    
+    if time_budget_callback.exhausted:
+        stopped_by = "time_budget"
+    elif early_stopping.stopped_epoch > 0:
+        stopped_by = "early_stopping"
+    else:
+        stopped_by = "max_epochs"
+    
+    val_loss = history.history['val_loss']
+    training_info = {
+        "epochs": len(val_loss),
+        "best_epoch": int(np.argmin(val_loss)) + 1,
+        "val_loss": float(np.min(val_loss)),
+        "training_time": time.monotonic() - started,
+        "batch_size": batch_size,
+        "stopped_by": stopped_by
+    }
+    return model, training_info
+
+def predict_with_cached_model(key, data, look_back=60, time_budget=TRAINING_TIME_BUDGET):
+    """
+    Прогнозує наступну ціну моделлю з кешу або навчає нову і додає її до кешу.
+    
+    :param key: Ключ моделі в кеші
+    :param data: DataFrame з колонками close та sentiment
+    :return: Кортеж (прогнозована ціна, метадані навчання)
+    """
+    cached = model_cache.get(key)
+    if cached is not None:
+        model, scaler, training_info = cached
+        return predict_price(model, data, scaler, look_back), training_info
     
     X, y, scaler = prepare_data(data, look_back)
+    model, training_info = train_model(X, y, time_budget)
+    next_price = predict_price(model, data, scaler, look_back)
+    
+    if not model_cache.put(key, model, scaler, training_info):
+        del model
+        clear_keras_session()
     
-    model = create_model(look_back, X.shape[2])
-    model.fit(X, y, epochs=50, batch_size=32, verbose=0)
+    return next_price, training_info
+
+def train_and_predict(symbol, start_date, end_date, look_back=60, time_budget=TRAINING_TIME_BUDGET, requested_at=None):
+    """
+    Завантажує дані та прогнозує наступну ціну. Бюджет часу рахується від початку запиту,
+    тож навчання отримує лише час, що залишився після очікування в черзі пулу, запуску
+    робочого процесу та завантаження даних і новин.
+    
+    :param requested_at: Час надходження запиту (time.time()); за замовчуванням - початок виклику
+    :return: Кортеж (остання ціна, прогнозована ціна, настрій новин, метадані навчання з request_time)
+    """
+    requested_at = requested_at or time.time()
+    data = get_stock_data(symbol, start_date, end_date)
+    
+    remaining_budget = max(time_budget - (time.time() - requested_at), 0)
+    next_price, training_info = predict_with_cached_model((symbol, start_date, end_date, look_back), data, look_back, remaining_budget)
+    training_info = dict(training_info, request_time=time.time() - requested_at)
     
     last_price = data['close'].iloc[-1]
-    next_price = predict_price(model, data, scaler, look_back)
     
-    return last_price, next_price, data['sentiment'].iloc[-1]
+    return last_price, next_price, data['sentiment'].iloc[-1], training_info
+
+def train_and_predict_with_metrics(symbol, start_date, end_date, requested_at=None):
+    """
+    train_and_predict для робочого процесу: разом із результатом повертає метрики кешу моделей,
+    бо кеш живе в тому процесі, де виконується прогноз.
 
+    :return: Кортеж (результат train_and_predict, метрики кешу моделей)
+    """
+    return train_and_predict(symbol, start_date, end_date, requested_at=requested_at), model_cache.get_metrics()